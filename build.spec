@@ -7,7 +7,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('templates', 'templates'), ('static', 'static')],
-    hiddenimports=['flask', 'jinja2', 'werkzeug', 'markupsafe', 'itsdangerous', 'pywebview', 'tkinter', 'tkinter.filedialog'],
+    hiddenimports=['flask', 'orjson', 'jinja2', 'werkzeug', 'markupsafe', 'itsdangerous', 'pywebview', 'tkinter', 'tkinter.filedialog'],
     hookspath=[],
     runtime_hooks=[],
     excludes=[],
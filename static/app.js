@@ -32,7 +32,7 @@ function humanSize(bytes) {
 function setStatus(text) { els.status.textContent = text || ''; }
 function setCrumbs(text) { els.crumbs.textContent = text || ''; }
 
-let scanCtx = { id: null, pollTimer: null, animTimer: null, canceled: false };
+let scanCtx = { id: null, pollTimer: null, animTimer: null, events: null, canceled: false };
 function setButtonsScanning(scanning) {
   els.scanBtn.disabled = scanning;
   els.stopBtn.disabled = !scanning;
@@ -88,7 +88,7 @@ async function startScan() {
     scanCtx.id = data.scan_id;
     setStatus('Scanning...');
     startIndeterminate();
-    pollStatus();
+    watchEvents();
   } catch (e) {
     console.error(e);
     setButtonsScanning(false);
@@ -96,14 +96,51 @@ async function startScan() {
   }
 }
 
+function showProgress(st) {
+  setStatus(`${st.state} | files: ${st.files} | bytes: ${humanSize(st.bytes || 0)}${st.current ? ' | current: ' + st.current : ''}`);
+}
+
+// Follow progress pushed by the server; the finished result (or a dropped
+// stream) is picked up by pollStatus, which remains the fallback.
+function watchEvents() {
+  if (!window.EventSource) { pollStatus(); return; }
+  const source = new EventSource(`/api/scan/events?scan_id=${encodeURIComponent(scanCtx.id)}`);
+  scanCtx.events = source;
+  const stop = () => {
+    source.close();
+    if (scanCtx.events === source) scanCtx.events = null;
+  };
+  source.onmessage = (event) => {
+    const st = JSON.parse(event.data);
+    showProgress(st);
+    if (st.state !== 'running') {
+      stop();
+      pollStatus();
+    }
+  };
+  source.onerror = () => {
+    if (scanCtx.events !== source) return;
+    stop();
+    pollStatus();
+  };
+}
+
 async function pollStatus() {
   if (!scanCtx.id) return;
   try {
     const res = await fetch(`/api/scan/status?scan_id=${encodeURIComponent(scanCtx.id)}`);
     const st = await res.json();
+    if (res.status >= 500) {
+      // The result could not be encoded; polling again would fail the same way
+      stopIndeterminate(0);
+      setButtonsScanning(false);
+      scanCtx.id = null;
+      setStatus('Error: ' + (st.error || res.status));
+      return;
+    }
     if (st.error) throw new Error(st.error);
     // Update UI
-    setStatus(`${st.state} | files: ${st.files} | bytes: ${humanSize(st.bytes || 0)}${st.current ? ' | current: ' + st.current : ''}`);
+    showProgress(st);
     if (st.state === 'done' && st.result) {
       stopIndeterminate(100);
       setButtonsScanning(false);
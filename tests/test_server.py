@@ -0,0 +1,201 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from collections import namedtuple
+
+import server
+
+
+class NonUtf8NameTest(unittest.TestCase):
+    """Names that are not valid UTF-8 reach Python as lone surrogates."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        try:
+            with open(os.path.join(os.fsencode(self.root), b"bad\xff\xfe"), "wb") as f:
+                f.write(b"x" * 7)
+        except (OSError, UnicodeError):
+            self.skipTest("filesystem does not accept non-UTF-8 names")
+        self.client = server.app.test_client()
+
+    def _finished_scan(self) -> str:
+        res = self.client.post("/api/scan/start", json={"path": self.root})
+        scan_id = res.get_json()["scan_id"]
+        deadline = time.time() + 10
+        while server.scan_manager.status(scan_id)["state"] == "running":
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+        return scan_id
+
+    def test_status_encodes_result(self):
+        scan_id = self._finished_scan()
+        res = self.client.get(f"/api/scan/status?scan_id={scan_id}")
+        self.assertEqual(res.status_code, 200)
+        status = json.loads(res.data)
+        self.assertEqual(status["state"], "done")
+        (child,) = status["result"]["children"]
+        self.assertEqual(child["name"], "bad\udcff\udcfe")
+        self.assertEqual(child["size"], 7)
+
+    def test_events_encode_current_path(self):
+        scan_id = self._finished_scan()
+        res = self.client.get(f"/api/scan/events?scan_id={scan_id}")
+        self.assertEqual(res.status_code, 200)
+        events = [line[len("data: "):] for line in res.get_data(as_text=True).splitlines() if line.startswith("data: ")]
+        self.assertEqual(json.loads(events[-1])["state"], "done")
+
+    def test_provider_escapes_surrogates(self):
+        self.assertEqual(json.loads(server.app.json.dumps({"name": "bad\udcff"})), {"name": "bad\udcff"})
+
+
+class ScanTreeTest(unittest.TestCase):
+    """collect_paths + process_collected give the same trees as the old recursive scan."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self._write("a.txt", 10)
+        self._write(".hidden", 5)
+        os.makedirs(os.path.join(self.root, "sub", "deep"))
+        self._write(os.path.join("sub", "b.bin"), 100)
+        self._write(os.path.join("sub", "deep", "c"), 1000)
+
+    def _write(self, name: str, size: int) -> None:
+        with open(os.path.join(self.root, name), "wb") as f:
+            f.write(b"x" * size)
+
+    def _path(self, *names: str) -> str:
+        return os.path.join(self.root, *names)
+
+    def _sub(self) -> dict:
+        return {
+            "name": "sub", "path": self._path("sub"), "size": 1100, "children": [
+                {"name": "deep", "path": self._path("sub", "deep"), "size": 1000, "children": [
+                    {"name": "c", "path": self._path("sub", "deep", "c"), "size": 1000},
+                ]},
+                {"name": "b.bin", "path": self._path("sub", "b.bin"), "size": 100},
+            ],
+        }
+
+    def _scan(self, **kwargs) -> dict:
+        collected = server.collect_paths(self.root, **kwargs)
+        return server.to_json(server.process_collected(collected), self.root)
+
+    def test_hidden_files_excluded(self):
+        self.assertEqual(self._scan(exclude_hidden=True), {
+            "name": os.path.basename(self.root), "path": self.root, "size": 1110, "children": [
+                self._sub(),
+                {"name": "a.txt", "path": self._path("a.txt"), "size": 10},
+            ],
+        })
+
+    def test_hidden_files_included(self):
+        tree = self._scan(exclude_hidden=False)
+        self.assertEqual(tree["size"], 1115)
+        self.assertEqual(tree["children"][-1], {"name": ".hidden", "path": self._path(".hidden"), "size": 5})
+
+    def test_max_depth(self):
+        sub_size = os.stat(self._path("sub")).st_size
+        tree = self._scan(max_depth=1)
+        self.assertEqual(tree["size"], 10 + sub_size)
+        self.assertIn(
+            {"name": "sub", "path": self._path("sub"), "size": sub_size, "note": "max_depth_reached"},
+            tree["children"],
+        )
+
+    def test_symlink_loop(self):
+        try:
+            os.symlink(self.root, self._path("loop"), target_is_directory=True)
+        except (OSError, NotImplementedError):
+            self.skipTest("cannot create symlinks here")
+        tree = self._scan(follow_symlinks=True)
+        self.assertEqual(tree["size"], 1110)
+        self.assertEqual(tree["children"], [
+            self._sub(),
+            {"name": "a.txt", "path": self._path("a.txt"), "size": 10},
+            {"name": "loop", "path": self._path("loop"), "size": 0, "note": "skipped_cycle"},
+        ])
+        # Not followed unless asked to
+        self.assertEqual(self._scan()["size"], 1110)
+
+    def test_file_root(self):
+        path = self._path("a.txt")
+        collected = server.collect_paths(path)
+        self.assertEqual(server.to_json(server.process_collected(collected), path),
+                         {"name": "a.txt", "path": path, "size": 10})
+
+
+class TopChildrenTest(unittest.TestCase):
+    def _dir(self, sizes) -> server.Node:
+        children = [server.Node(f"f{i}", size) for i, size in enumerate(sizes)]
+        return server.Node("d", sum(sizes), children)
+
+    def test_rest_is_folded_into_other_size(self):
+        node = self._dir([5, 50, 1, 20, 7])
+        server._order_children(node, 2)
+        self.assertEqual([child.size for child in node.children], [50, 20])
+        self.assertEqual(node.other_size, node.size - sum(child.size for child in node.children))
+        self.assertEqual(node.other_size, 13)
+
+    def test_no_truncation_within_limit(self):
+        for top_n in (3, 4):
+            node = self._dir([5, 50, 1])
+            server._order_children(node, top_n)
+            self.assertEqual([child.size for child in node.children], [50, 5, 1])
+            self.assertIsNone(node.other_size)
+
+    def test_process_collected_keeps_sizes(self):
+        collected = server.CollectedPaths(
+            root="/r",
+            dirs=["/r", "/r/s"],
+            parents=[-1, 0],
+            files=[(0, "a", 1), (0, "b", 2), (0, "c", 3), (1, "x", 10), (1, "y", 20)],
+        )
+        root = server.process_collected(collected, top_n_per_level=2)
+        # Totals still count the children that were dropped
+        self.assertEqual(root.size, 36)
+        self.assertEqual([child.name for child in root.children], ["s", "c"])
+        self.assertEqual(root.other_size, 3)
+        (sub, _) = root.children
+        self.assertEqual(sub.size, 30)
+        self.assertIsNone(sub.other_size)
+
+
+FakeStat = namedtuple("FakeStat", "st_dev st_ino st_ctime_ns")
+
+
+@unittest.skipIf(os.name == "nt", "the cache is disabled on Windows")
+class UnreadableDirCacheTest(unittest.TestCase):
+    def test_unchanged_entry_matches(self):
+        cache = server.UnreadableDirCache()
+        cache.add("/d", FakeStat(1, 2, 3))
+        self.assertTrue(cache.is_known_unreadable("/d", FakeStat(1, 2, 3)))
+        self.assertFalse(cache.is_known_unreadable("/other", FakeStat(1, 2, 3)))
+
+    def test_changed_entry_is_dropped(self):
+        cache = server.UnreadableDirCache()
+        cache.add("/d", FakeStat(1, 2, 3))
+        # chmod bumped the change time
+        self.assertFalse(cache.is_known_unreadable("/d", FakeStat(1, 2, 4)))
+        # Dropped rather than kept for the old stat result
+        self.assertFalse(cache.is_known_unreadable("/d", FakeStat(1, 2, 3)))
+
+    def test_expired_entry_is_dropped(self):
+        cache = server.UnreadableDirCache(ttl=0)
+        cache.add("/d", FakeStat(1, 2, 3))
+        self.assertFalse(cache.is_known_unreadable("/d", FakeStat(1, 2, 3)))
+
+    def test_size_is_bounded(self):
+        cache = server.UnreadableDirCache(maxsize=2)
+        for name in ("/a", "/b", "/c"):
+            cache.add(name, FakeStat(1, 2, 3))
+        self.assertFalse(cache.is_known_unreadable("/a", FakeStat(1, 2, 3)))
+        self.assertTrue(cache.is_known_unreadable("/c", FakeStat(1, 2, 3)))
+
+
+if __name__ == "__main__":
+    unittest.main()